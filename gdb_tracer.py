@@ -9,6 +9,20 @@ import json
 import time
 import re
 
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib json module
+    orjson = None
+
+# Registers captured at every step
+REG_NAMES = ['rax', 'rbx', 'rcx', 'rdx', 'rsi', 'rdi', 'rbp', 'rsp', 'rip']
+
+# One register row of "info registers" output, e.g. "rax    0x1c    28"
+_REG_RE = re.compile(rf'^({"|".join(REG_NAMES)})\s+0x([0-9a-f]+)', re.M)
+
+# Memory operand syntax in AT&T disassembly
+_MEM_RE = re.compile(r'[+-]?0x[0-9a-f]+\([^)]+\)|\([^)]+\)')
+
 class NameInstructionTracer(gdb.Command):
     """Custom GDB command to trace CPU instructions during name processing"""
     
@@ -17,11 +31,17 @@ class NameInstructionTracer(gdb.Command):
         self.instructions = []
         self.registers = []
         self.memory_accesses = []
+        self.start_time = None
+        self.end_time = None
         
     def invoke(self, arg, from_tty):
         """Main tracing function"""
         print(f"Starting instruction trace for name processing...")
         
+        # Keep GDB from prompting or paging while we drive it
+        gdb.execute("set confirm off")
+        gdb.execute("set pagination off")
+        
         # Set up logging
         gdb.execute("set logging overwrite on")
         gdb.execute("set logging file instruction_trace.log")
@@ -52,6 +72,17 @@ class NameInstructionTracer(gdb.Command):
         instruction_count = 0
         max_instructions = 1000  # Limit to prevent infinite loops
         
+        self.start_time = time.time()
+        
+        # The architecture does not change while stepping, so look it up once
+        try:
+            arch = gdb.selected_frame().architecture()
+        except gdb.error as e:
+            # No frame (e.g. the program exited before the breakpoint); save what we have
+            print(f"GDB Error: {e}")
+            self.end_time = time.time()
+            return
+        
         try:
             while instruction_count < max_instructions:
                 # Get current instruction
@@ -59,12 +90,11 @@ class NameInstructionTracer(gdb.Command):
                     frame = gdb.selected_frame()
                     pc = int(frame.pc())
                     
-                    # Get disassembly of current instruction
-                    disasm_output = gdb.execute(f"x/i 0x{pc:x}", to_string=True)
-                    instruction = self.parse_instruction(disasm_output, pc)
+                    # Disassemble the current instruction through the Python API
+                    instruction = arch.disassemble(pc, count=1)[0]['asm']
                     
                     # Get register states
-                    registers = self.get_register_state()
+                    registers = self.get_register_state(frame)
                     
                     # Get memory access info if available
                     memory_info = self.get_memory_info(instruction)
@@ -75,16 +105,17 @@ class NameInstructionTracer(gdb.Command):
                         'pc': f"0x{pc:x}",
                         'instruction': instruction,
                         'registers': registers,
-                        'memory': memory_info,
-                        'timestamp': time.time()
+                        'memory': memory_info
                     }
                     
                     self.instructions.append(trace_entry)
                     
-                    print(f"Step {instruction_count}: 0x{pc:x} - {instruction}")
+                    # Report progress periodically rather than on every step
+                    if instruction_count % 100 == 0:
+                        print(f"Step {instruction_count}: 0x{pc:x} - {instruction}")
                     
-                    # Execute single instruction
-                    gdb.execute("stepi")
+                    # Execute single instruction (captured so it stays off the console)
+                    gdb.execute("stepi", to_string=True)
                     instruction_count += 1
                     
                 except gdb.error as e:
@@ -96,38 +127,23 @@ class NameInstructionTracer(gdb.Command):
                     
         except KeyboardInterrupt:
             print("\nTracing interrupted by user")
+        finally:
+            self.end_time = time.time()
     
-    def parse_instruction(self, disasm_output, pc):
-        """Parse GDB disassembly output"""
-        # Example: "0x555555555149 <main+4>:\tmov    %rdi,-0x18(%rbp)"
-        try:
-            lines = disasm_output.strip().split('\n')
-            for line in lines:
-                if f"0x{pc:x}" in line:
-                    # Extract instruction part after the tab
-                    parts = line.split('\t')
-                    if len(parts) > 1:
-                        return parts[1].strip()
-        except:
-            pass
-        return "unknown"
-    
-    def get_register_state(self):
+    def get_register_state(self, frame):
         """Capture current CPU register values"""
-        registers = {}
-        reg_names = ['rax', 'rbx', 'rcx', 'rdx', 'rsi', 'rdi', 'rbp', 'rsp', 'rip']
-        
-        for reg in reg_names:
+        try:
+            return {reg: f"0x{int(frame.read_register(reg)) & 0xffffffffffffffff:x}"
+                    for reg in REG_NAMES}
+        except (AttributeError, ValueError, gdb.error):
+            # Older GDB or unreadable frame: parse a single "info registers" dump
+            registers = dict.fromkeys(REG_NAMES, "unknown")
             try:
-                output = gdb.execute(f"info registers {reg}", to_string=True)
-                # Parse register value
-                match = re.search(rf'{reg}\s+0x([0-9a-f]+)', output)
-                if match:
-                    registers[reg] = f"0x{match.group(1)}"
-            except:
-                registers[reg] = "unknown"
-        
-        return registers
+                output = gdb.execute("info registers", to_string=True)
+            except gdb.error:
+                return registers
+            registers.update((reg, f"0x{val}") for reg, val in _REG_RE.findall(output))
+            return registers
     
     def get_memory_info(self, instruction):
         """Extract memory access information from instruction"""
@@ -138,8 +154,7 @@ class NameInstructionTracer(gdb.Command):
         }
         
         # Look for memory operands like (%rax), 0x8(%rbp), etc.
-        memory_pattern = r'[+-]?0x[0-9a-f]+\([^)]+\)|\([^)]+\)'
-        matches = re.findall(memory_pattern, instruction)
+        matches = _MEM_RE.findall(instruction)
         
         if matches:
             memory_info['address'] = matches[0]
@@ -160,13 +175,19 @@ class NameInstructionTracer(gdb.Command):
             'metadata': {
                 'total_instructions': len(self.instructions),
                 'timestamp': time.time(),
+                'trace_start': self.start_time,
+                'trace_end': self.end_time,
                 'tracer_version': '1.0'
             },
             'instructions': self.instructions
         }
         
-        with open('cpu_trace.json', 'w') as f:
-            json.dump(trace_data, f, indent=2)
+        if orjson is not None:
+            with open('cpu_trace.json', 'wb') as f:
+                f.write(orjson.dumps(trace_data, option=orjson.OPT_INDENT_2))
+        else:
+            with open('cpu_trace.json', 'w') as f:
+                json.dump(trace_data, f, indent=2)
         
         print("Trace data saved to cpu_trace.json")
 
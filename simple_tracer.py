@@ -6,6 +6,17 @@ import subprocess
 import json
 import os
 
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib json module
+    orjson = None
+
+# Lookup tables indexed by character code
+NOTE_MAP = np.array(['C4', 'D4', 'E4', 'F4', 'G4', 'A4', 'B4'])
+INSTR_MAP = np.array(['piano', 'guitar', 'violin'])
+
 def trace_cpu_instructions(program_name, name_input):
     """Trace CPU instructions using GDB subprocess"""
     
@@ -45,18 +56,17 @@ quit
 def create_mock_trace_data(name_input):
     """Create mock CPU trace data for testing"""
     
-    # Simulate CPU instructions based on name
-    instructions = []
-    notes = []
-    rhythms = []
-    instruments = []
+    # Character code points of the name (UTF-32 keeps ord() semantics for any text)
+    codes = np.frombuffer(name_input.encode('utf-32-le', 'surrogatepass'), dtype='<u4')
     
-    # Basic simulation based on name characters
-    for i, char in enumerate(name_input):
-        ascii_val = ord(char)
-        
-        # Create mock instruction
-        instruction = {
+    # Convert to musical data with whole-array lookups
+    notes = NOTE_MAP[codes % 7].tolist()
+    rhythms = np.where(codes & 1, 0.5, 0.25).tolist()
+    instruments = INSTR_MAP[codes % 3].tolist()
+    
+    # Simulate CPU instructions based on name (kept for debugging)
+    instructions = [
+        {
             'step': i,
             'pc': f'0x{(0x555555555000 + i * 4):x}',
             'instruction': f'mov ${ascii_val},%eax' if i % 2 == 0 else f'add ${ascii_val},%ebx',
@@ -66,13 +76,8 @@ def create_mock_trace_data(name_input):
                 'rcx': f'0x{(ascii_val * 3):x}'
             }
         }
-        instructions.append(instruction)
-        
-        # Convert to musical data
-        note_map = ['C4', 'D4', 'E4', 'F4', 'G4', 'A4', 'B4']
-        notes.append(note_map[ascii_val % 7])
-        rhythms.append(0.25 if ascii_val % 2 == 0 else 0.5)
-        instruments.append(['piano', 'guitar', 'violin'][ascii_val % 3])
+        for i, ascii_val in enumerate(codes.tolist())
+    ]
     
     return {
         'tempo': 120 + (len(name_input) * 10),
@@ -107,8 +112,12 @@ if __name__ == "__main__":
     musical_data = create_mock_trace_data(name)
     
     # Save to JSON
-    with open('musical_data.json', 'w') as f:
-        json.dump(musical_data, f, indent=2)
+    if orjson is not None:
+        with open('musical_data.json', 'wb') as f:
+            f.write(orjson.dumps(musical_data, option=orjson.OPT_INDENT_2))
+    else:
+        with open('musical_data.json', 'w') as f:
+            json.dump(musical_data, f, indent=2)
     
     print(f"Musical data created for '{name}'")
     print(f"Tempo: {musical_data['tempo']} BPM")
@@ -51,7 +51,7 @@ if [ -f "cpu_trace.json" ]; then
     echo
     echo "=== Trace Complete ==="
     echo "CPU instruction trace saved to: cpu_trace.json"
-    echo "Instruction log saved to: instruction_trace.log"
+    echo "GDB session log saved to: instruction_trace.log"
     
     # Show summary
     echo
@@ -61,7 +61,12 @@ if [ -f "cpu_trace.json" ]; then
     
     echo
     echo "=== Sample Instructions ==="
-    head -20 instruction_trace.log
+    # The GDB log only carries periodic progress lines, so sample the trace itself
+    python3 -c '
+import json
+for entry in json.load(open("cpu_trace.json"))["instructions"][:20]:
+    print("Step {step}: {pc} - {instruction}".format(**entry))
+'
     
     echo
     echo "=== First Few Traced Instructions (JSON) ==="
@@ -76,7 +81,7 @@ echo
 echo "=== Files Created ==="
 echo "- name_processor (executable)"
 echo "- cpu_trace.json (JSON trace data)"
-echo "- instruction_trace.log (raw instruction log)"
+echo "- instruction_trace.log (GDB session log)"
 echo "- gdb_script.txt (GDB commands used)"
 
 echo
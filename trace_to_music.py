@@ -5,13 +5,72 @@ Converts actual CPU instruction traces into musical data
 """
 
 import json
+import os
 import re
-from collections import defaultdict
+from collections import Counter
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib json module
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # fall back to loading the whole trace with json
+    ijson = None
+
+# Register columns captured by the tracer, in trace order
+REG_NAMES = ['rax', 'rbx', 'rcx', 'rdx', 'rsi', 'rdi', 'rbp', 'rsp', 'rip']
+
+# Traces larger than this are streamed with ijson; smaller ones are parsed in one go
+STREAM_THRESHOLD_BYTES = 64 * 1024 * 1024
+
+# Parse errors raised by whichever JSON reader is in use
+JSON_ERRORS = (json.JSONDecodeError,) + ((ijson.JSONError,) if ijson is not None else ())
+
+class InvalidTraceError(Exception):
+    """Raised when a trace has no top-level instruction list"""
+
+def instruction_list(trace):
+    """Return the instruction list of a fully parsed trace"""
+    instructions = trace.get('instructions') if isinstance(trace, dict) else None
+    if not isinstance(instructions, list):
+        raise InvalidTraceError
+    return instructions
+
+def stream_instructions(f):
+    """Yield instruction entries from a trace file one at a time with ijson"""
+    found = False
+    for entry in ijson.items(f, 'instructions.item'):
+        found = True
+        yield entry
+    
+    if not found:
+        # Nothing streamed: rescan to tell an empty instruction list from a missing one
+        f.seek(0)
+        if not any(prefix == 'instructions' and event == 'start_array'
+                   for prefix, event, _ in ijson.parse(f)):
+            raise InvalidTraceError
+
+class ParseCache(dict):
+    """Maps trace strings to parsed values, parsing each distinct string once"""
+    
+    def __init__(self, parse):
+        super().__init__()
+        self.parse = parse
+    
+    def __missing__(self, val_str):
+        val = self[val_str] = self.parse(val_str)
+        return val
 
 class CPUTraceToMusic:
     def __init__(self, trace_file='cpu_trace.json'):
         self.trace_file = trace_file
-        self.trace_data = None
+        self.distinct_opcodes = None
+        self.opcode_idx = None
+        self.reg_matrix = None
         self.musical_data = {
             'notes': [],
             'rhythms': [],
@@ -50,56 +109,95 @@ class CPUTraceToMusic:
             'rbp': 'bass',
             'rsp': 'synth'
         }
+        
+        # Opcode families, matched as prefixes so suffixes like 'movq' collapse to 'mov'
+        base_opcodes = ('mov', 'add', 'sub', 'mul', 'div', 'cmp', 'jmp',
+                        'call', 'ret', 'push', 'pop', 'lea', 'xor', 'and', 'or')
+        # Each family is identified by its first three characters ('or' by two)
+        self.opcode_prefixes = {base[:3]: base for base in base_opcodes}
+        
+        # Instruction complexity classes used for rhythm
+        self.simple_ops = frozenset(['mov', 'push', 'pop'])
+        self.complex_ops = frozenset(['mul', 'div', 'call'])
     
     def load_trace(self):
         """Load CPU trace data from JSON file"""
         try:
-            with open(self.trace_file, 'r') as f:
-                self.trace_data = json.load(f)
-            print(f"Loaded trace with {len(self.trace_data['instructions'])} instructions")
+            opcode_ids = {}
+            opcode_idx = []
+            register_rows = []
+            # Most register values repeat from step to step, so reuse earlier parses
+            register_values = ParseCache(self.parse_register)
+            # Loops re-execute identical instruction text; code each as an opcode id
+            instruction_ids = ParseCache(lambda instruction: opcode_ids.setdefault(
+                self.extract_opcode(instruction), len(opcode_ids)))
+            
+            # Walk instruction entries and keep only the compact columns we need
+            with open(self.trace_file, 'rb') as f:
+                # Whole-file orjson parsing is fastest; stream when memory matters
+                large = os.fstat(f.fileno()).st_size > STREAM_THRESHOLD_BYTES
+                if ijson is not None and (large or orjson is None):
+                    entries = stream_instructions(f)
+                elif orjson is not None:
+                    entries = instruction_list(orjson.loads(f.read()))
+                else:
+                    entries = instruction_list(json.load(f))
+                
+                for entry in entries:
+                    opcode_idx.append(instruction_ids[entry['instruction']])
+                    registers = entry['registers']
+                    # Non-string cells (possibly unhashable) never reach the cache
+                    row_values = (registers.get(reg, 'unknown') for reg in REG_NAMES)
+                    register_rows.append([register_values[val] if isinstance(val, str) else 0
+                                          for val in row_values])
+            
+            # Distinct opcodes, indexed by the per-instruction opcode ids
+            self.distinct_opcodes = list(opcode_ids)
+            self.opcode_idx = np.array(opcode_idx, dtype=np.intp)
+            # Every register value parsed once into an (instructions x registers) matrix
+            self.reg_matrix = np.array(register_rows, dtype=np.uint64).reshape(-1, len(REG_NAMES))
+            print(f"Loaded trace with {len(self.opcode_idx)} instructions")
             return True
         except FileNotFoundError:
             print(f"Error: {self.trace_file} not found")
             return False
-        except json.JSONDecodeError:
+        except JSON_ERRORS:
             print(f"Error: Invalid JSON in {self.trace_file}")
             return False
+        except InvalidTraceError:
+            print(f"Error: Invalid trace in {self.trace_file} (no instruction list)")
+            return False
     
     def analyze_instructions(self):
         """Analyze CPU instructions and convert to musical elements"""
-        if not self.trace_data:
+        # Traces repeat a handful of opcodes and registers, so each distinct value
+        # goes through the musical tables once and results expand by array lookup
+        if self.opcode_idx is None:
             return
         
-        instructions = self.trace_data['instructions']
-        notes = []
-        rhythms = []
-        instruments = []
+        # Map instruction to musical note
+        note_lut = np.array([self.instruction_to_note.get(opcode, 'C4')
+                             for opcode in self.distinct_opcodes], dtype=object)
         
-        for i, entry in enumerate(instructions):
-            instruction = entry['instruction']
-            registers = entry['registers']
-            
-            # Extract instruction opcode
-            opcode = self.extract_opcode(instruction)
-            
-            # Map instruction to musical note
-            note = self.instruction_to_note.get(opcode, 'C4')
-            notes.append(note)
-            
-            # Calculate rhythm from instruction complexity
-            rhythm = self.calculate_rhythm(instruction, registers)
-            rhythms.append(rhythm)
-            
-            # Determine instrument from active registers
-            instrument = self.determine_instrument(registers)
-            instruments.append(instrument)
+        # Calculate rhythm from instruction complexity
+        rhythm_lut = np.array([self.calculate_rhythm(opcode)
+                               for opcode in self.distinct_opcodes], dtype=np.float64)
+        
+        # Determine instrument from the most significant register per instruction
+        instrument_lut = np.array([self.determine_instrument(reg_index)
+                                   for reg_index in range(len(REG_NAMES))], dtype=object)
+        dominant_regs = self.reg_matrix.argmax(axis=1)
+        
+        notes = note_lut[self.opcode_idx].tolist()
+        rhythms = rhythm_lut[self.opcode_idx].tolist()
+        instruments = instrument_lut[dominant_regs].tolist()
         
         self.musical_data['notes'] = notes
         self.musical_data['rhythms'] = rhythms  
         self.musical_data['instruments'] = instruments
         
         # Calculate tempo from instruction frequency
-        self.musical_data['tempo'] = self.calculate_tempo()
+        self.musical_data['tempo'] = self.calculate_tempo(len(notes))
         
         # Determine key from register patterns
         self.musical_data['key'] = self.determine_key()
@@ -109,63 +207,52 @@ class CPUTraceToMusic:
         if not instruction or instruction == 'unknown':
             return 'mov'
         
-        # Split instruction and get first part (opcode)
-        parts = instruction.split()
+        # Split off only the first part (opcode); operands stay unsplit
+        parts = instruction.split(None, 1)
         if parts:
             opcode = parts[0].lower()
             # Remove suffixes like 'movq' -> 'mov'
-            base_opcodes = ['mov', 'add', 'sub', 'mul', 'div', 'cmp', 'jmp', 
-                           'call', 'ret', 'push', 'pop', 'lea', 'xor', 'and', 'or']
-            for base in base_opcodes:
-                if opcode.startswith(base):
-                    return base
+            base = self.opcode_prefixes.get(opcode[:3]) or self.opcode_prefixes.get(opcode[:2])
+            if base and opcode.startswith(base):
+                return base
             return opcode
         return 'mov'
     
-    def calculate_rhythm(self, instruction, registers):
+    def calculate_rhythm(self, opcode):
         """Calculate rhythm duration based on instruction complexity"""
         base_duration = 0.25  # Quarter note
         
         # Simple instructions = shorter notes
-        simple_ops = ['mov', 'push', 'pop']
-        complex_ops = ['mul', 'div', 'call']
-        
-        opcode = self.extract_opcode(instruction)
-        
-        if opcode in simple_ops:
+        if opcode in self.simple_ops:
             return base_duration
-        elif opcode in complex_ops:
+        elif opcode in self.complex_ops:
             return base_duration * 2
         else:
             return base_duration * 1.5
     
-    def determine_instrument(self, registers):
-        """Determine instrument based on which registers are active"""
-        # Find register with most significant value
-        max_reg = 'rax'  # default
-        max_val = 0
-        
-        for reg, val_str in registers.items():
-            if val_str != 'unknown':
-                try:
-                    # Convert hex string to int
-                    val = int(val_str, 16) if val_str.startswith('0x') else 0
-                    if val > max_val:
-                        max_val = val
-                        max_reg = reg
-                except:
-                    pass
-        
-        return self.register_to_instrument.get(max_reg, 'piano')
+    def parse_register(self, val_str):
+        """Convert a traced register value to an int (0 if unavailable)"""
+        # Only "0x..." hex counts; 'unknown', bare hex and non-strings map to 0.
+        # ParseCache runs this once per distinct string, so the check is cheap.
+        if not isinstance(val_str, str) or not val_str.startswith('0x'):
+            return 0
+        try:
+            val = int(val_str, 16)
+        except ValueError:
+            return 0
+        # Registers are 64-bit; anything outside that range cannot be stored in the matrix
+        return val if 0 <= val < 1 << 64 else 0
     
-    def calculate_tempo(self):
+    def determine_instrument(self, reg_index):
+        """Determine instrument from the index of the most significant register"""
+        return self.register_to_instrument.get(REG_NAMES[reg_index], 'piano')
+    
+    def calculate_tempo(self, instruction_count):
         """Calculate tempo based on instruction density"""
-        if not self.trace_data or len(self.trace_data['instructions']) == 0:
+        if instruction_count == 0:
             return 120
         
         # More instructions = faster tempo
-        instruction_count = len(self.trace_data['instructions'])
-        
         if instruction_count < 100:
             return 90   # Slow
         elif instruction_count < 500:
@@ -175,32 +262,22 @@ class CPUTraceToMusic:
     
     def determine_key(self):
         """Determine musical key from register value patterns"""
-        if not self.trace_data:
+        if self.reg_matrix is None:
             return 'C'
         
-        # Analyze register value patterns
-        register_sums = defaultdict(int)
+        # Sum each register column exactly in two vectorized passes: the low and
+        # high 32-bit halves cannot wrap uint64 for traces under 2**32 rows
+        low_sums = (self.reg_matrix & np.uint64(0xffffffff)).sum(axis=0).tolist()
+        high_sums = (self.reg_matrix >> np.uint64(32)).sum(axis=0).tolist()
+        register_sums = [(high << 32) + low for high, low in zip(high_sums, low_sums)]
         
-        for entry in self.trace_data['instructions']:
-            registers = entry['registers']
-            for reg, val_str in registers.items():
-                if val_str != 'unknown':
-                    try:
-                        val = int(val_str, 16) if val_str.startswith('0x') else 0
-                        register_sums[reg] += val
-                    except:
-                        pass
-        
-        # Map dominant register to key
-        if register_sums:
-            dominant_reg = max(register_sums, key=register_sums.get)
-            key_map = {
-                'rax': 'C', 'rbx': 'D', 'rcx': 'E', 'rdx': 'F',
-                'rsi': 'G', 'rdi': 'A', 'rbp': 'B', 'rsp': 'C'
-            }
-            return key_map.get(dominant_reg, 'C')
-        
-        return 'C'
+        # Map dominant register to key (first register wins ties, as argmax does)
+        dominant_reg = REG_NAMES[max(range(len(REG_NAMES)), key=register_sums.__getitem__)]
+        key_map = {
+            'rax': 'C', 'rbx': 'D', 'rcx': 'E', 'rdx': 'F',
+            'rsi': 'G', 'rdi': 'A', 'rbp': 'B', 'rsp': 'C'
+        }
+        return key_map.get(dominant_reg, 'C')
     
     def generate_music_notation(self):
         """Generate human-readable music notation"""
@@ -227,12 +304,16 @@ class CPUTraceToMusic:
         # Add metadata
         self.musical_data['metadata'] = {
             'source_trace': self.trace_file,
-            'total_instructions': len(self.trace_data['instructions']) if self.trace_data else 0,
+            'total_instructions': len(self.opcode_idx) if self.opcode_idx is not None else 0,
             'conversion_version': '1.0'
         }
         
-        with open(output_file, 'w') as f:
-            json.dump(self.musical_data, f, indent=2)
+        if orjson is not None:
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(self.musical_data, option=orjson.OPT_INDENT_2))
+        else:
+            with open(output_file, 'w') as f:
+                json.dump(self.musical_data, f, indent=2)
         
         print(f"Musical data saved to {output_file}")
     
@@ -244,12 +325,10 @@ class CPUTraceToMusic:
         print(f"Total notes: {len(self.musical_data['notes'])}")
         
         # Instrument usage
-        instrument_count = defaultdict(int)
-        for inst in self.musical_data['instruments']:
-            instrument_count[inst] += 1
+        instrument_count = Counter(self.musical_data['instruments'])
         
         print("\nInstrument usage:")
-        for instrument, count in sorted(instrument_count.items()):
+        for instrument, count in instrument_count.most_common():
             percentage = (count / len(self.musical_data['instruments'])) * 100
             print(f"  {instrument}: {count} notes ({percentage:.1f}%)")
         